@@ -0,0 +1,375 @@
+import logging
+import os
+import asyncio
+import io
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+def _install_uvloop() -> None:
+    """
+    Use uvloop's faster event loop when it's available.
+
+    This runs before the generator modules below are imported, so the asyncio primitives they
+    create bind to the loop the bot actually runs on.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+_install_uvloop()
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest
+from telegram.ext import (
+    Application, CommandHandler, MessageHandler, CallbackContext,
+    CallbackQueryHandler, filters
+)
+from voice_gen import generate_voice, generate_voice_stream, is_cached, close_session as close_voice_session
+from video_gen import generate_avatar_video, download_video, close_session as close_video_session
+from script_gen import script_batcher, stream_gpt_script, transcribe_audio
+from state_store import UserStateStore
+from dotenv import load_dotenv
+from aiolimiter import AsyncLimiter
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# User state tracking
+USER_STATES = UserStateStore(os.getenv('REDIS_URL'))
+
+# Outbound Telegram calls are paced below the bot-wide 30 messages/second limit
+_tg_limiter = AsyncLimiter(29, 1)
+
+async def send(coro_fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+    """
+    Make an outbound Telegram call, spaced below the bot-wide limit of 30 messages per second.
+    """
+    async with _tg_limiter:
+        return await coro_fn(*args, **kwargs)
+
+async def start(update: Update, context: CallbackContext) -> None:
+    """
+    Handle the /start command. Display a menu for the user to choose an input method.
+    """
+    keyboard = [
+        [InlineKeyboardButton("📝 Direct Script", callback_data='direct')],
+        [InlineKeyboardButton("🐦 Twitter Handle", callback_data='twitter')],
+        [InlineKeyboardButton("🎤 Voice Idea", callback_data='voice')],
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await send(update.message.reply_text, "🎥 Welcome to VideoBot! Choose your input method:", reply_markup=reply_markup)
+
+async def handle_button(update: Update, context: CallbackContext) -> None:
+    """
+    Handle button presses from the user.
+    """
+    query = update.callback_query
+    await send(query.answer)
+    input_type = query.data
+    async with USER_STATES.lock(query.from_user.id):
+        state = {'input_type': input_type}
+        current = await USER_STATES.get(query.from_user.id)
+        if current is not None and 'in_progress' in current:
+            # A video is still being made; it hands over to this selection when it finishes
+            state.update(in_progress=current['in_progress'], reselected='1')
+        await USER_STATES.set(query.from_user.id, state)
+    prompts = {
+        'direct': "✍️ Send your full script text (1-2 paragraphs):",
+        'twitter': "🔗 Send a Twitter handle (without @), e.g., 'elonmusk':",
+        'voice': "🎤 Send a voice message explaining your reel idea:",
+    }
+    await send(query.edit_message_text, text=prompts[input_type])
+
+async def process_content(update: Update, context: CallbackContext) -> None:
+    """
+    Process user input based on their selected input method.
+    """
+    user_id = update.message.from_user.id
+    job_id = uuid.uuid4().hex
+    # Only the claim and the final release hold the user's lock, so button presses aren't
+    # blocked while a video renders. The claim is atomic in Redis, so only one worker can
+    # start a job for this user.
+    async with USER_STATES.lock(user_id):
+        user_state = await USER_STATES.claim(user_id, job_id)
+
+    if user_state is None:
+        await send(update.message.reply_text, "⚠️ Please start with /start")
+        return
+
+    if user_state.pop('in_progress') != job_id:
+        await send(update.message.reply_text, "⏳ Still working on your previous request, please wait.")
+        return
+
+    # Renders can outlast the idle session timeout, so keep the claim alive while the job runs
+    keepalive_task = asyncio.create_task(keep_session_alive(user_id))
+    voice_task = None
+    status = None
+    next_state = None
+    heygen_voice_id = os.getenv('HEYGEN_VOICE_ID')
+    try:
+        input_type = user_state['input_type']
+
+        if input_type == 'direct':
+            script = update.message.text.strip()
+            status = await update_status(update, status, "📝 Processing your script...")
+
+        elif input_type == 'voice':
+            if update.message.voice:
+                status = await update_status(update, status, "🎤 Transcribing your voice message...")
+                voice_file = await send(update.message.voice.get_file)
+                voice_buffer = io.BytesIO()
+                await voice_file.download_to_memory(out=voice_buffer)
+                voice_buffer.seek(0)
+                voice_buffer.name = "voice.ogg"  # Whisper infers the audio format from the name
+                prompt = await transcribe_audio(voice_buffer)
+                await send(update.message.reply_text, f"🖋️ Transcribed Idea:\n{prompt}")
+                status = await update_status(update, status, "📝 Generating script from your idea...")
+                script, voice_task = await write_script(prompt, heygen_voice_id)
+            else:
+                await send(update.message.reply_text, "⚠️ Please send a voice message.")
+                return
+
+        elif input_type == 'twitter':
+            if not context.bot_data.get('enable_twitter'):
+                await send(update.message.reply_text, "⚠️ Twitter scraping is currently paused. Use /start to choose another option.")
+                return
+
+            if 'handle' not in user_state:
+                handle = update.message.text.strip()
+                next_state = {**user_state, 'handle': handle}  # Wait for the keyword in the next message
+                await send(update.message.reply_text, f"🔗 Got handle @{handle}\nNow send a keyword to search:")
+                return
+
+            # Imported lazily so snscrape is only needed when Twitter scraping is enabled
+            from snscrape_scraper import scrape_twitter_content
+
+            keyword = update.message.text.strip()
+            handle = user_state['handle']
+            status = await update_status(update, status, f"🔍 Scraping tweets for @{handle} with keyword '{keyword}'...")
+            tweets = await asyncio.to_thread(scrape_twitter_content, handle, keyword)
+            if not tweets:
+                await update_status(update, status, "⚠️ No tweets found. Use /start to try again.")
+                return
+            prompt = "\n".join(tweets[:5])
+            status = await update_status(update, status, "📝 Generating script from the tweets...")
+            script, voice_task = await write_script(prompt, heygen_voice_id)
+
+        if heygen_voice_id:
+            # HeyGen voices the script itself, so skip ElevenLabs and the audio upload
+            await send(update.message.reply_text, f"📄 Generated Script:\n\n{script}")
+            status = await update_status(update, status, "🎬 Creating avatar video...")
+            video_url = await generate_avatar_video(
+                audio_path=None,
+                api_key=os.getenv('HEYGEN_API_KEY'),
+                avatar_id=os.getenv('AVATAR_ID'),
+                script_text=script,
+                voice_id=heygen_voice_id,
+                download=False
+            )
+        else:
+            # Start the voiceover while the script and status messages are sent
+            if voice_task is None:
+                voice_task = asyncio.create_task(
+                    generate_voice(text=script, eleven_api_key=os.getenv('ELEVEN_LABS_API_KEY'))
+                )
+
+            # Send the generated script to the user
+            await send(update.message.reply_text, f"📄 Generated Script:\n\n{script}")
+
+            # Generate voiceover
+            status = await update_status(update, status, "🔊 Generating voiceover...")
+            audio_file_path = await voice_task
+
+            # Send the voiceover to the user and generate the avatar video concurrently
+            status = await update_status(update, status, "🎬 Creating avatar video...")
+            _, video_url = await gather_or_cancel(
+                send_voiceover(update, audio_file_path),
+                generate_avatar_video(
+                    audio_path=audio_file_path,
+                    api_key=os.getenv('HEYGEN_API_KEY'),
+                    avatar_id=os.getenv('AVATAR_ID'),
+                    download=False
+                )
+            )
+
+        # Send the video to the user, letting Telegram fetch it from HeyGen directly
+        try:
+            await send(update.message.reply_video, video=video_url, caption="🎥 Your Custom Video", supports_streaming=True)
+        except BadRequest:
+            # Telegram only fetches videos up to 20 MB by URL, so upload larger ones ourselves
+            video_file_path = await download_video(video_url)
+            video = await asyncio.to_thread(Path(video_file_path).read_bytes)
+            await send(
+                update.message.reply_video,
+                video=video,
+                filename=os.path.basename(video_file_path),
+                caption="🎥 Your Custom Video",
+                supports_streaming=True
+            )
+        await update_status(update, status, "✅ Your video is ready!")
+
+    except Exception as e:
+        logger.error(f"Error processing content: {e}", exc_info=True)
+        await update_status(update, status, f"⚠️ An error occurred: {e}")
+
+    finally:
+        keepalive_task.cancel()
+        await asyncio.gather(keepalive_task, return_exceptions=True)
+
+        # Release the user's state, unless they picked a new input method while this job ran
+        async with USER_STATES.lock(user_id):
+            current_state = await USER_STATES.get(user_id)
+            if current_state is not None and current_state.get('in_progress') == job_id:
+                if 'reselected' in current_state:
+                    await USER_STATES.set(user_id, {'input_type': current_state['input_type']})
+                elif next_state is not None:
+                    await USER_STATES.set(user_id, next_state)
+                else:
+                    await USER_STATES.delete(user_id)
+
+        # Clean up temporary files
+        if voice_task is not None:
+            if not voice_task.done():
+                voice_task.cancel()
+            elif not voice_task.cancelled() and 'audio_file_path' not in locals():
+                # The voiceover finished but was never awaited: retrieve its outcome and drop its file
+                if voice_task.exception() is None and not is_cached(voice_task.result()):
+                    await remove_file(voice_task.result())
+        if 'audio_file_path' in locals() and not is_cached(audio_file_path):
+            await remove_file(audio_file_path)
+        if 'video_file_path' in locals():
+            await remove_file(video_file_path)
+
+async def keep_session_alive(user_id: int) -> None:
+    """
+    Refresh the user's session expiry until cancelled.
+    """
+    while True:
+        await asyncio.sleep(USER_STATES.ttl / 3)
+        try:
+            await USER_STATES.touch(user_id)
+        except Exception as e:
+            logger.warning(f"Failed to refresh session for user {user_id}: {e}")
+
+async def write_script(prompt: str, heygen_voice_id: Optional[str]) -> Tuple[str, Optional[asyncio.Task]]:
+    """
+    Generate a script from the user's idea or tweets.
+
+    Unless HeyGen voices the script itself, the ElevenLabs voiceover is started while GPT is
+    still writing, and its task is returned alongside the script.
+    """
+    if heygen_voice_id:
+        return await script_batcher.submit(prompt), None
+
+    # Voice the script sentence by sentence while GPT is still writing it
+    sentences = asyncio.Queue()
+    voice_task = asyncio.create_task(
+        generate_voice_stream(sentences, eleven_api_key=os.getenv('ELEVEN_LABS_API_KEY'))
+    )
+    try:
+        script = await stream_gpt_script(prompt, sentences)
+    except BaseException:
+        voice_task.cancel()
+        raise
+    return script, voice_task
+
+async def gather_or_cancel(*coros: Awaitable[Any]) -> List[Any]:
+    """
+    Run the coroutines concurrently and return their results in order.
+
+    Unlike asyncio.gather, the first failure cancels the others and waits for them to finish, so
+    no task keeps running (or leaves an unretrieved exception) after the error is raised.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def send_voiceover(update: Update, audio_file_path: str) -> None:
+    """
+    Send the generated voiceover file to the user.
+    """
+    audio = await asyncio.to_thread(Path(audio_file_path).read_bytes)
+    await send(
+        update.message.reply_audio,
+        audio=audio,
+        filename=os.path.basename(audio_file_path),
+        caption="🎧 Your Voiceover File"
+    )
+
+async def update_status(update: Update, status: Optional[Message], text: str) -> Message:
+    """
+    Show progress in a single status message: send it the first time, then edit it in place.
+    """
+    if status is None:
+        return await send(update.message.reply_text, text)
+    await send(status.edit_text, text)
+    return status
+
+async def remove_file(path: str) -> None:
+    """
+    Delete a file, if it exists, without blocking the event loop.
+    """
+    if await asyncio.to_thread(os.path.exists, path):
+        await asyncio.to_thread(os.remove, path)
+
+async def close_connections(app: Application) -> None:
+    """
+    Close the shared HTTP sessions, the script batcher and the user state store.
+    """
+    await asyncio.gather(close_voice_session(), close_video_session(), script_batcher.close(), USER_STATES.close())
+
+def create_app(enable_twitter: bool = False) -> Application:
+    """
+    Build the Telegram application and register its handlers.
+
+    Args:
+        enable_twitter (bool): Whether the Twitter input method scrapes tweets (requires snscrape). Defaults to False.
+
+    Returns:
+        Application: The configured application, ready for `run_app`.
+    """
+    app = Application.builder().token(os.getenv('TELEGRAM_TOKEN')).concurrent_updates(True).post_shutdown(close_connections).build()
+    app.bot_data['enable_twitter'] = enable_twitter
+    app.add_handler(CommandHandler('start', start))
+    app.add_handler(CallbackQueryHandler(handle_button))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, process_content))
+    app.add_handler(MessageHandler(filters.VOICE, process_content))
+    return app
+
+def run_app(app: Application) -> None:
+    """
+    Run the bot with a webhook if WEBHOOK_URL is set, otherwise with long polling.
+    """
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if webhook_url:
+        # Telegram pushes updates to us; requires a public HTTPS endpoint (or reverse proxy)
+        token = os.getenv('TELEGRAM_TOKEN')
+        logger.info("[BOT STATUS] Bot is running with a webhook...")
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=int(os.getenv('WEBHOOK_PORT', '8443')),
+            url_path=token,
+            webhook_url=f"{webhook_url.rstrip('/')}/{token}",
+            secret_token=os.getenv('WEBHOOK_SECRET')
+        )
+    else:
+        logger.info("[BOT STATUS] Bot is running...")
+        app.run_polling()
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+
+import openai
+from aiolimiter import AsyncLimiter
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Proactive request pacing, kept below OpenAI's per-minute request limits
+CHAT_LIMITER = AsyncLimiter(500, 60)
+WHISPER_LIMITER = AsyncLimiter(50, 60)
+
+# Bulk jobs at least this large may go through the OpenAI Batch API
+BATCH_API_THRESHOLD = 20
+
+# Shared OpenAI client, created on first use so the API key is read after load_dotenv()
+_CLIENT: Optional[openai.AsyncOpenAI] = None
+
+def _get_client() -> openai.AsyncOpenAI:
+    """
+    Return the module-wide AsyncOpenAI client, creating it on first use.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _CLIENT
+
+# Sentence boundaries used to split a streamed script into voiceover chunks
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+|\n+')
+
+def _script_messages(prompt: str) -> List[Dict[str, str]]:
+    return [{
+        "role": "user",
+        "content": f"Create a 60-second video script using this input:\n{prompt}\n\nRequirements:\n1. Conversational, easy-to-understand language.\n2. Natural pauses for voiceover.\n3. Include scene descriptions in [brackets].\n4. Max 300 words."
+    }]
+
+async def generate_gpt_script(prompt: str) -> str:
+    """
+    Generate a script using OpenAI's GPT-4 model.
+    
+    Args:
+        prompt (str): The input prompt for the script.
+    
+    Returns:
+        str: The generated script.
+    """
+    async with CHAT_LIMITER:
+        response = await _get_client().chat.completions.create(
+            model="gpt-4",
+            messages=_script_messages(prompt)
+        )
+    return response.choices[0].message.content.strip()
+
+async def generate_gpt_scripts(prompts: List[str], urgent: bool = True, poll_interval: float = 30) -> List[str]:
+    """
+    Generate scripts for many prompts at once, e.g. for bulk or admin jobs.
+
+    Small or urgent jobs run as parallel chat completions paced by `CHAT_LIMITER`. Non-urgent
+    jobs of `BATCH_API_THRESHOLD` prompts or more go through OpenAI's Batch API, which is
+    cheaper and has its own rate limit pool but can take up to 24 hours.
+
+    Args:
+        prompts (List[str]): The input prompts, one per script.
+        urgent (bool): Whether results are needed right away. Defaults to True.
+        poll_interval (float): Time (in seconds) between Batch API status checks. Defaults to 30.
+
+    Returns:
+        List[str]: The generated scripts, in the same order as `prompts`.
+
+    Raises:
+        Exception: If the batch fails, expires or any request in it fails.
+    """
+    if urgent or len(prompts) < BATCH_API_THRESHOLD:
+        return list(await asyncio.gather(*(generate_gpt_script(prompt) for prompt in prompts)))
+
+    client = _get_client()
+    requests = "\n".join(
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": "gpt-4", "messages": _script_messages(prompt)}
+        })
+        for i, prompt in enumerate(prompts)
+    )
+    batch_file = await client.files.create(file=("scripts.jsonl", requests.encode()), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info(f"Submitted {len(prompts)} scripts as batch {batch.id}")
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        error_message = f"Script batch {batch.id} did not complete. Status: {batch.status}"
+        logger.error(error_message)
+        raise Exception(error_message)
+
+    output = await client.files.content(batch.output_file_id)
+    scripts: List[Optional[str]] = [None] * len(prompts)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            error_message = f"Script request {result['custom_id']} failed: {result.get('error') or response.get('body')}"
+            logger.error(error_message)
+            raise Exception(error_message)
+        scripts[int(result["custom_id"])] = response["body"]["choices"][0]["message"]["content"].strip()
+
+    if any(script is None for script in scripts):
+        error_message = f"Script batch {batch.id} is missing results."
+        logger.error(error_message)
+        raise Exception(error_message)
+    return scripts
+
+async def stream_gpt_script(prompt: str, sentences: "asyncio.Queue[Optional[str]]") -> str:
+    """
+    Generate a script with GPT-4, streaming each complete sentence onto a queue as it arrives.
+
+    A `None` sentinel is put on the queue once generation ends, so a consumer such as
+    `voice_gen.generate_voice_stream` can start speaking before the full script exists.
+
+    Args:
+        prompt (str): The input prompt for the script.
+        sentences (asyncio.Queue): Queue that receives each sentence, then `None`.
+
+    Returns:
+        str: The full generated script.
+    """
+    parts = []
+    buffer = ""
+    try:
+        async with CHAT_LIMITER:
+            stream = await _get_client().chat.completions.create(
+                model="gpt-4",
+                messages=_script_messages(prompt),
+                stream=True
+            )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            parts.append(delta)
+            buffer += delta
+            last_end = 0
+            for match in SENTENCE_END.finditer(buffer):
+                sentence = buffer[last_end:match.end()].strip()
+                if sentence:
+                    await sentences.put(sentence)
+                last_end = match.end()
+            buffer = buffer[last_end:]
+        if buffer.strip():
+            await sentences.put(buffer.strip())
+    finally:
+        await sentences.put(None)
+    return "".join(parts).strip()
+
+async def transcribe_audio(audio_file: BinaryIO) -> str:
+    """
+    Transcribe an audio file using OpenAI's Whisper model.
+
+    Args:
+        audio_file (BinaryIO): An open binary file containing the audio.
+
+    Returns:
+        str: The transcribed text.
+    """
+    async with WHISPER_LIMITER:
+        transcript = await _get_client().audio.transcriptions.create(model="whisper-1", file=audio_file)
+    return transcript.text
+
+class ScriptBatcher:
+    """
+    Coalesce script requests that arrive close together and dispatch them as one batch.
+
+    A lone prompt is dispatched right away. During a burst, prompts arriving within
+    `batch_window` seconds (up to `max_batch_size`) are sent to OpenAI concurrently with a
+    single `asyncio.gather`. This only groups dispatch timing: every prompt is still its own
+    chat completion, so it does not reduce the request count (`CHAT_LIMITER` paces those).
+    """
+
+    def __init__(self, max_batch_size: int = 8, batch_window: float = 0.2) -> None:
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        # Created on first use so it belongs to the loop the bot actually runs on
+        self._queue: "Optional[asyncio.Queue[Tuple[str, asyncio.Future]]]" = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def submit(self, prompt: str) -> str:
+        """
+        Queue a prompt for the next batch and wait for its script.
+
+        Args:
+            prompt (str): The input prompt for the script.
+
+        Returns:
+            str: The generated script.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def close(self) -> None:
+        """
+        Stop the batching worker and any in-flight batches. Call this on application shutdown.
+        """
+        tasks = [task for task in [self._worker, *self._batches] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[Tuple[str, asyncio.Future]] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while not self._queue.empty() and len(batch) < self.max_batch_size:
+                    batch.append(self._queue.get_nowait())
+
+                # Only wait for stragglers during a burst, so a lone prompt isn't delayed
+                deadline = loop.time() + self.batch_window
+                while 1 < len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Dispatch in the background so the next batch can start collecting immediately
+                task = asyncio.create_task(self._dispatch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+                batch = []
+        except BaseException as e:
+            # Don't leave callers waiting forever on prompts this worker will never send
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            _fail_futures([future for _, future in batch], e)
+            raise
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        logger.info(f"Generating {len(batch)} script(s) in one batch...")
+        try:
+            results = await asyncio.gather(
+                *(generate_gpt_script(prompt) for prompt, _ in batch),
+                return_exceptions=True
+            )
+        except BaseException as e:
+            _fail_futures([future for _, future in batch], e)
+            raise
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue  # The caller gave up waiting
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+def _fail_futures(futures: List[asyncio.Future], error: BaseException) -> None:
+    for future in futures:
+        if future.done():
+            continue
+        if isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            future.cancel()
+
+# Shared batcher used by the bot handlers
+script_batcher = ScriptBatcher()
@@ -1,21 +1,46 @@
+import logging
+import threading
+from itertools import islice
+
 import snscrape.modules.twitter as sntwitter
+from cachetools import TTLCache
 
-def scrape_twitter_content(handle, keyword):
+logger = logging.getLogger(__name__)
+
+# Number of tweets fetched per search
+MAX_TWEETS = 5
+
+# Recently scraped tweets keyed by (handle, keyword), kept for 15 minutes
+_TWEET_CACHE = TTLCache(maxsize=1024, ttl=900)
+_TWEET_CACHE_LOCK = threading.Lock()
+
+def get_or_compute(key, fn):
+    """Return the cached value for key, computing and caching it with fn() on a miss."""
+    with _TWEET_CACHE_LOCK:
+        if key in _TWEET_CACHE:
+            return _TWEET_CACHE[key]
+
+    # Compute outside the lock so a slow scrape doesn't block other lookups
+    value = fn()
+    if value:
+        with _TWEET_CACHE_LOCK:
+            _TWEET_CACHE[key] = value
+    return value
+
+def _scrape_tweets(handle, keyword):
     """Scrape tweets locally using snscrape."""
     query = f'from:{handle} "{keyword}"'
-    tweets = []
-
-    print(f"🔍 Searching for tweets with: {query}")
+    logger.info(f"🔍 Searching for tweets with: {query}")
 
-    for i, tweet in enumerate(sntwitter.TwitterSearchScraper(query).get_items()):
-        if i >= 5:
-            break
-        tweets.append(tweet.content)
-        print(f"✅ Tweet {i+1}: {tweet.content[:100]}...")
+    tweets = [tweet.content for tweet in islice(sntwitter.TwitterSearchScraper(query).get_items(), MAX_TWEETS)]
 
     if not tweets:
-        print(f"⚠️ No tweets found for @{handle} with keyword: {keyword}")
+        logger.info(f"⚠️ No tweets found for @{handle} with keyword: {keyword}")
     else:
-        print(f"✅ Found {len(tweets)} tweets locally")
+        logger.info(f"✅ Found {len(tweets)} tweets locally")
 
-    return tweets
+    return tuple(tweets)
+
+def scrape_twitter_content(handle, keyword):
+    """Scrape tweets for a handle and keyword, reusing recent results from the cache."""
+    return list(get_or_compute((handle, keyword), lambda: _scrape_tweets(handle, keyword)))
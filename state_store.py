@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+# Returns the session's fields, first setting `in_progress` to ARGV[1] if the session exists
+# and has no job running. Runs atomically on the Redis server.
+_CLAIM_SCRIPT = """
+local state = redis.call('HGETALL', KEYS[1])
+if #state > 0 and redis.call('HSETNX', KEYS[1], 'in_progress', ARGV[1]) == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    table.insert(state, 'in_progress')
+    table.insert(state, ARGV[1])
+end
+return state
+"""
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class UserStateStore:
+    """
+    Per-user conversation state, stored in Redis when a URL is given and in memory otherwise.
+
+    State is a flat dict of strings (kept as a Redis hash under `state:<user_id>`), so it can
+    be shared by several bot workers and survives restarts. Use `lock(user_id)` around any
+    read-modify-write of a user's state; it only serializes handlers within this process, so
+    use `claim(user_id, job_id)` to start a job, which is atomic across workers.
+
+    Sessions expire `ttl` seconds after their last write, so abandoned or interrupted
+    conversations don't accumulate. Call `touch(user_id)` to keep a busy session alive.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, ttl: int = 600, maxsize: int = 10_000) -> None:
+        self.ttl = ttl
+        # Locks are dropped once no handler holds or waits on them
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._memory: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._memory_lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+            self._claim_script = self._redis.register_script(_CLAIM_SCRIPT)
+            logger.info("Storing user state in Redis.")
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"state:{user_id}"
+
+    def lock(self, user_id: int) -> asyncio.Lock:
+        """
+        Return the lock serializing handlers for this user.
+        """
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the user's state, or None if they have no active session.
+        """
+        if self._redis is not None:
+            state = await self._redis.hgetall(self._key(user_id))
+            return state or None
+        with self._memory_lock:
+            state = self._memory.get(user_id)
+            return dict(state) if state is not None else None
+
+    async def set(self, user_id: int, state: Dict[str, Any]) -> None:
+        """
+        Replace the user's state.
+        """
+        if self._redis is not None:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.delete(self._key(user_id))
+                pipe.hset(self._key(user_id), mapping=state)
+                pipe.expire(self._key(user_id), self.ttl)
+                await pipe.execute()
+        else:
+            with self._memory_lock:
+                self._memory[user_id] = dict(state)
+
+    async def update(self, user_id: int, **fields: Any) -> None:
+        """
+        Add or overwrite fields in the user's state.
+        """
+        if self._redis is not None:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hset(self._key(user_id), mapping=fields)
+                pipe.expire(self._key(user_id), self.ttl)
+                await pipe.execute()
+        else:
+            with self._memory_lock:
+                # Re-insert so the session's expiry restarts from this write
+                state = self._memory.pop(user_id, {})
+                state.update(fields)
+                self._memory[user_id] = state
+
+    async def claim(self, user_id: int, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Mark the user's session as running `job_id`, unless another job already holds it.
+
+        Returns the user's state after the attempt, or None if they have no active session.
+        The claim succeeded if the returned state's `in_progress` equals `job_id`.
+        """
+        if self._redis is not None:
+            fields = await self._claim_script(keys=[self._key(user_id)], args=[job_id, self.ttl])
+            return dict(zip(fields[::2], fields[1::2])) or None
+        with self._memory_lock:
+            state = self._memory.pop(user_id, None)
+            if state is None:
+                return None
+            state.setdefault('in_progress', job_id)
+            self._memory[user_id] = state
+            return dict(state)
+
+    async def touch(self, user_id: int) -> None:
+        """
+        Restart the expiry of the user's session without changing it, if they have one.
+        """
+        if self._redis is not None:
+            await self._redis.expire(self._key(user_id), self.ttl)
+        else:
+            with self._memory_lock:
+                state = self._memory.pop(user_id, None)
+                if state is not None:
+                    self._memory[user_id] = state
+
+    async def delete(self, user_id: int) -> None:
+        """
+        Forget the user's state.
+        """
+        if self._redis is not None:
+            await self._redis.delete(self._key(user_id))
+        else:
+            with self._memory_lock:
+                self._memory.pop(user_id, None)
+
+    async def close(self) -> None:
+        """
+        Close the Redis connection, if any. Call this on application shutdown.
+        """
+        if self._redis is not None:
+            await self._redis.close()
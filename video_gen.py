@@ -1,7 +1,13 @@
-import requests
+import aiohttp
+import asyncio
+import hashlib
+import json
 import time
+import random
 import logging
 import os  # Add this import statement
+import uuid
+from aiolimiter import AsyncLimiter
 from typing import Optional
 
 # Configure logging
@@ -11,33 +17,121 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def generate_avatar_video(
-    audio_path: str, 
+# Status codes worth retrying while polling (rate limiting and server-side hiccups)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Proactive request pacing for the HeyGen API (uploads, generation requests and status polls)
+HEYGEN_LIMITER = AsyncLimiter(60, 60)
+
+# Shared HTTP session so connections to HeyGen are pooled and kept alive across calls
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """
+    Return the module-wide aiohttp session, creating it on first use.
+    """
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        _SESSION = aiohttp.ClientSession(connector=connector)
+    return _SESSION
+
+async def close_session() -> None:
+    """
+    Close the shared aiohttp session. Call this on application shutdown.
+    """
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
+# Size of the chunks streamed to disk when downloading the rendered video
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Rendered video URLs are cached on disk by audio (or script) hash and avatar. HeyGen's
+# video URLs are signed and expire, so entries are only reused for a day.
+CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "cache")
+VIDEO_URL_CACHE_TTL = 24 * 60 * 60
+
+def _cache_key(
+    avatar_id: str,
+    audio_path: Optional[str],
+    script_text: Optional[str],
+    voice_id: Optional[str]
+) -> str:
+    digest = hashlib.sha256()
+    if script_text is not None:
+        digest.update(f"text\0{voice_id}\0{script_text}".encode())
+    else:
+        with open(audio_path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return hashlib.sha256(f"{digest.hexdigest()}\0{avatar_id}".encode()).hexdigest()
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"video_{key}.json")
+
+def _load_cached_url(key: str) -> Optional[str]:
+    try:
+        with open(_cache_path(key)) as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if time.time() - entry["created_at"] > VIDEO_URL_CACHE_TTL:
+        return None
+    return entry["video_url"]
+
+def _store_cached_url(key: str, video_url: str) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Drop expired entries so the cache directory doesn't grow forever
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            if name.startswith("video_") and time.time() - os.path.getmtime(path) > VIDEO_URL_CACHE_TTL:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+    with open(_cache_path(key), "w") as f:
+        json.dump({"video_url": video_url, "created_at": time.time()}, f)
+
+async def generate_avatar_video(
+    audio_path: Optional[str], 
     api_key: str, 
     avatar_id: str, 
-    max_retries: int = 3, 
-    poll_interval: int = 10
+    script_text: Optional[str] = None, 
+    voice_id: Optional[str] = None, 
+    base_delay: float = 2, 
+    max_delay: float = 30, 
+    max_wait: float = 600, 
+    download: bool = True
 ) -> str:
     """
     Generate an avatar video using the HeyGen API.
 
     Args:
-        audio_path (str): Path to the audio file to use for the video.
+        audio_path (str, optional): Path to the audio file to use for the video. Ignored when `script_text` is given.
         api_key (str): Your HeyGen API key.
         avatar_id (str): The ID of the avatar to use.
-        max_retries (int): Maximum number of retries for polling the video status. Defaults to 3.
-        poll_interval (int): Time interval (in seconds) between polling attempts. Defaults to 10.
+        script_text (str, optional): Script for HeyGen to voice with its own TTS instead of uploading audio.
+        voice_id (str, optional): The HeyGen voice to use with `script_text`.
+        base_delay (float): Initial delay (in seconds) between status polls. Defaults to 2.
+        max_delay (float): Upper bound (in seconds) for the backoff delay. Defaults to 30.
+        max_wait (float): Total time budget (in seconds) to wait for the render. Defaults to 600.
+        download (bool): Download the video locally. If False, return HeyGen's hosted video URL instead. Defaults to True.
 
     Returns:
-        str: Path to the generated video file.
+        str: Path to the generated video file, or its URL if `download` is False.
 
     Raises:
         FileNotFoundError: If the audio file does not exist.
-        ValueError: If the API key or avatar ID is missing.
+        ValueError: If the API key, avatar ID or HeyGen voice ID is missing.
         Exception: If any step in the process fails.
     """
     # Validate inputs
-    if not os.path.exists(audio_path):  # Now this will work
+    if script_text is not None:
+        if not voice_id:
+            raise ValueError("HeyGen voice ID is required to voice a text script.")
+    elif not audio_path or not os.path.exists(audio_path):  # Now this will work
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
     
     if not api_key:
@@ -51,85 +145,140 @@ def generate_avatar_video(
     }
 
     try:
-        # Step 1: Upload audio file
-        logger.info("Uploading audio file to HeyGen...")
-        with open(audio_path, 'rb') as f:
-            audio_resp = requests.post(
-                "https://api.heygen.com/v1/audio/upload",
-                headers=headers,
-                files={"audio": f}
-            )
-        
-        if audio_resp.status_code != 200:
-            error_message = f"Audio upload failed. Status code: {audio_resp.status_code}, Response: {audio_resp.text}"
-            logger.error(error_message)
-            raise Exception(error_message)
-
-        audio_url = audio_resp.json()['data']['url']
-        logger.info("Audio file uploaded successfully.")
-
-        # Step 2: Request video generation
-        payload = {
-            "avatar_id": avatar_id,
-            "script": {"type": "audio", "audio_url": audio_url},
-            "test": False
-        }
-
-        logger.info("Requesting video generation...")
-        vid_resp = requests.post("https://api.heygen.com/v1/video/generate", json=payload, headers=headers)
-        
-        if vid_resp.status_code != 200:
-            error_message = f"Video generation request failed. Status code: {vid_resp.status_code}, Response: {vid_resp.text}"
-            logger.error(error_message)
-            raise Exception(error_message)
-
-        video_id = vid_resp.json()["data"]["video_id"]
-        logger.info(f"Video generation started. Video ID: {video_id}")
-
-        # Step 3: Poll for video completion
-        video_url = None
-        retries = 0
-        while not video_url and retries < max_retries:
-            logger.info(f"Checking video status (Attempt {retries + 1}/{max_retries})...")
-            status_resp = requests.get(f"https://api.heygen.com/v1/video/status?video_id={video_id}", headers=headers)
-            
-            if status_resp.status_code != 200:
-                error_message = f"Failed to check video status. Status code: {status_resp.status_code}, Response: {status_resp.text}"
-                logger.error(error_message)
-                retries += 1
-                time.sleep(poll_interval)  # Wait before retrying
-                continue
-
-            status_data = status_resp.json()["data"]
-            if status_data["status"] == "completed":
-                video_url = status_data["video_url"]
-                logger.info("Video generation completed successfully.")
-            elif status_data["status"] == "failed":
-                error_message = "Video generation failed."
+        # Reuse a recent render of the same audio (or script) and avatar
+        cache_key = await asyncio.to_thread(_cache_key, avatar_id, audio_path, script_text, voice_id)
+        video_url = await asyncio.to_thread(_load_cached_url, cache_key)
+        if video_url:
+            logger.info("Using cached video render.")
+        else:
+            session = _get_session()
+            if script_text is not None:
+                # Step 1: Let HeyGen voice the script itself, skipping the audio upload
+                script = {"type": "text", "input": script_text, "voice_id": voice_id}
+            else:
+                # Step 1: Upload audio file
+                logger.info("Uploading audio file to HeyGen...")
+                with open(audio_path, 'rb') as f:
+                    form = aiohttp.FormData()
+                    form.add_field("audio", f, filename=os.path.basename(audio_path))
+                    async with HEYGEN_LIMITER, session.post(
+                        "https://api.heygen.com/v1/audio/upload",
+                        headers=headers,
+                        data=form
+                    ) as audio_resp:
+                        if audio_resp.status != 200:
+                            error_message = f"Audio upload failed. Status code: {audio_resp.status}, Response: {await audio_resp.text()}"
+                            logger.error(error_message)
+                            raise Exception(error_message)
+
+                        audio_url = (await audio_resp.json())['data']['url']
+                logger.info("Audio file uploaded successfully.")
+                script = {"type": "audio", "audio_url": audio_url}
+
+            # Step 2: Request video generation
+            payload = {
+                "avatar_id": avatar_id,
+                "script": script,
+                "test": False
+            }
+
+            logger.info("Requesting video generation...")
+            async with HEYGEN_LIMITER, session.post("https://api.heygen.com/v1/video/generate", json=payload, headers=headers) as vid_resp:
+                if vid_resp.status != 200:
+                    error_message = f"Video generation request failed. Status code: {vid_resp.status}, Response: {await vid_resp.text()}"
+                    logger.error(error_message)
+                    raise Exception(error_message)
+
+                video_id = (await vid_resp.json())["data"]["video_id"]
+            logger.info(f"Video generation started. Video ID: {video_id}")
+
+            # Step 3: Poll for video completion with exponential backoff and jitter
+            video_url = None
+            attempt = 0
+            start = time.monotonic()
+            while not video_url and time.monotonic() - start <= max_wait:
+                attempt += 1
+                logger.info(f"Checking video status (Attempt {attempt})...")
+                try:
+                    async with HEYGEN_LIMITER, session.get(f"https://api.heygen.com/v1/video/status?video_id={video_id}", headers=headers) as status_resp:
+                        if status_resp.status in RETRYABLE_STATUSES:
+                            logger.warning(f"Transient error checking video status. Status code: {status_resp.status}")
+                            status_data = None
+                        elif status_resp.status != 200:
+                            error_message = f"Failed to check video status. Status code: {status_resp.status}, Response: {await status_resp.text()}"
+                            logger.error(error_message)
+                            raise Exception(error_message)
+                        else:
+                            status_data = (await status_resp.json())["data"]
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    logger.warning(f"Transient network error checking video status: {e}")
+                    status_data = None
+
+                if status_data and status_data["status"] == "completed":
+                    video_url = status_data["video_url"]
+                    logger.info("Video generation completed successfully.")
+                elif status_data and status_data["status"] == "failed":
+                    error_message = "Video generation failed."
+                    logger.error(error_message)
+                    raise Exception(error_message)
+                else:
+                    delay = min(max_delay, base_delay * 2 ** (attempt - 1)) + random.uniform(0, base_delay)
+                    remaining = max_wait - (time.monotonic() - start)
+                    if remaining <= 0:
+                        break
+                    await asyncio.sleep(min(delay, remaining))  # Wait before polling again
+
+            if not video_url:
+                error_message = f"Video generation did not complete within {max_wait} seconds ({attempt} status checks)."
                 logger.error(error_message)
                 raise Exception(error_message)
-            else:
-                retries += 1
-                time.sleep(poll_interval)  # Wait before retrying
 
-        if not video_url:
-            error_message = f"Video generation did not complete after {max_retries} retries."
-            logger.error(error_message)
-            raise Exception(error_message)
+            await asyncio.to_thread(_store_cached_url, cache_key, video_url)
+
+        # Step 4: Download the generated video, or hand back the hosted URL
+        if not download:
+            return video_url
+        return await download_video(video_url)
+
+    except aiohttp.ClientError as e:
+        logger.error(f"Network error occurred: {e}")
+        raise Exception(f"Network error: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error occurred: {e}")
+        raise Exception(f"Unexpected error: {e}")
+
+async def download_video(video_url: str) -> str:
+    """
+    Download a rendered video to a local file.
+
+    Args:
+        video_url (str): URL of the video to download.
+
+    Returns:
+        str: Path to the downloaded video file.
 
-        # Step 4: Download the generated video
+    Raises:
+        Exception: If the download fails.
+    """
+    try:
         logger.info("Downloading generated video...")
-        vid_content = requests.get(video_url).content
-        file_path = f"output_video_{int(time.time())}.mp4"  # Unique filename using timestamp
-        with open(file_path, "wb") as f:
-            f.write(vid_content)
+        file_path = f"output_video_{uuid.uuid4().hex}.mp4"
+        session = _get_session()
+        async with session.get(video_url) as download_resp:
+            download_resp.raise_for_status()
+            try:
+                with open(file_path, "wb") as f:
+                    async for chunk in download_resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            except BaseException:
+                # Don't leave a truncated video behind
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                raise
 
         logger.info(f"Video saved to {file_path}")
         return file_path
 
-    except requests.exceptions.RequestException as e:
+    except aiohttp.ClientError as e:
         logger.error(f"Network error occurred: {e}")
         raise Exception(f"Network error: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error occurred: {e}")
-        raise Exception(f"Unexpected error: {e}")
\ No newline at end of file
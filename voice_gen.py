@@ -1,8 +1,11 @@
-import requests
+import aiohttp
+import asyncio
+import hashlib
 import os
 import uuid
 import logging
-from typing import Optional
+from aiolimiter import AsyncLimiter
+from typing import BinaryIO, Optional
 
 # Configure logging
 logging.basicConfig(
@@ -11,7 +14,131 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def generate_voice(
+# Shared HTTP session so connections to ElevenLabs are pooled and kept alive across calls
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """
+    Return the module-wide aiohttp session, creating it on first use.
+    """
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        _SESSION = aiohttp.ClientSession(connector=connector)
+    return _SESSION
+
+async def close_session() -> None:
+    """
+    Close the shared aiohttp session. Call this on application shutdown.
+    """
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
+# Proactive request pacing for ElevenLabs: a request rate cap plus a cap on concurrent requests
+ELEVENLABS_LIMITER = AsyncLimiter(60, 60)
+ELEVENLABS_CONCURRENCY = asyncio.Semaphore(2)
+
+# Size of the chunks streamed to disk when saving the generated audio
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Voiceovers are cached on disk by script hash; the least recently used are evicted past this count
+CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "cache")
+CACHE_MAX_FILES = 256
+
+def _cache_path(text: str, voice_id: str) -> str:
+    key = hashlib.sha256(f"{voice_id}\0{text}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"voice_{key}.mp3")
+
+def _prune_cache() -> None:
+    cached = []
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith("voice_"):
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                cached.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                pass  # Evicted by another worker
+    if len(cached) <= CACHE_MAX_FILES:
+        return
+    cached.sort()
+    for _, path in cached[:len(cached) - CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _touch_cached(cache_path: str) -> bool:
+    """
+    Mark a cached voiceover as recently used. Returns False if it isn't in the cache.
+    """
+    try:
+        os.utime(cache_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+def _store_cached(audio_path: str, cache_path: str) -> None:
+    # Move the finished file into the cache in one step so readers never see a partial file
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    os.replace(audio_path, cache_path)
+    _prune_cache()
+
+def _remove_partial(audio_path: str) -> None:
+    try:
+        os.remove(audio_path)
+    except FileNotFoundError:
+        pass
+
+def is_cached(audio_path: str) -> bool:
+    """
+    Return True if the audio file belongs to the voiceover cache and must not be deleted by callers.
+    """
+    return os.path.dirname(os.path.abspath(audio_path)) == os.path.abspath(CACHE_DIR)
+
+async def _synthesize_to_file(
+    text: str,
+    eleven_api_key: str,
+    voice_id: str,
+    f: BinaryIO,
+    stream: bool = False
+) -> None:
+    """
+    Request speech for `text` from ElevenLabs and write the MPEG audio to an open file.
+    """
+    # API endpoint and headers
+    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+    if stream:
+        url += "/stream"
+    headers = {
+        "xi-api-key": eleven_api_key,
+        "Content-Type": "application/json",
+        "Accept": "audio/mpeg"
+    }
+
+    # Payload for the API request
+    payload = {
+        "text": text,
+        "voice_settings": {
+            "stability": 0.75,
+            "similarity_boost": 0.75
+        }
+    }
+
+    session = _get_session()
+    async with ELEVENLABS_CONCURRENCY, ELEVENLABS_LIMITER:
+        async with session.post(url, headers=headers, json=payload) as response:
+            # Check for errors in the response
+            if response.status != 200:
+                error_message = f"Voice generation failed. Status code: {response.status}, Response: {await response.text()}"
+                logger.error(error_message)
+                raise Exception(error_message)
+
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+
+async def generate_voice(
     text: str, 
     eleven_api_key: str, 
     voice_id: Optional[str] = "21m00Tcm4TlvDq8ikWAM"  # Replace with a valid voice_id
@@ -25,7 +152,8 @@ def generate_voice(
         voice_id (str, optional): The ID of the voice to use. Defaults to a valid voice_id.
     
     Returns:
-        str: The path to the saved audio file.
+        str: The path to the saved audio file. Identical requests share a cached file;
+            check `is_cached` before deleting it.
     
     Raises:
         ValueError: If the text or API key is empty.
@@ -38,45 +166,98 @@ def generate_voice(
     if not eleven_api_key:
         raise ValueError("ElevenLabs API key is required.")
     
-    # API endpoint and headers
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-    headers = {
-        "xi-api-key": eleven_api_key,
-        "Content-Type": "application/json",
-        "Accept": "audio/mpeg"
-    }
-
-    # Payload for the API request
-    payload = {
-        "text": text,
-        "voice_settings": {
-            "stability": 0.75,
-            "similarity_boost": 0.75
-        }
-    }
+    # Reuse the voiceover if this exact script was voiced before
+    cache_path = _cache_path(text, voice_id)
+    if await asyncio.to_thread(_touch_cached, cache_path):
+        logger.info(f"Using cached audio {cache_path}")
+        return cache_path
 
     try:
         # Make the API request
         logger.info("Sending request to ElevenLabs API...")
-        response = requests.post(url, headers=headers, json=payload)
+        audio_path = f"output_{uuid.uuid4().hex}.mp3"
+        try:
+            # Stream the audio to a temporary file
+            with open(audio_path, "wb") as f:
+                await _synthesize_to_file(text, eleven_api_key, voice_id, f)
+        except BaseException:
+            # Don't leave a truncated audio file behind
+            await asyncio.to_thread(_remove_partial, audio_path)
+            raise
 
-        # Check for errors in the response
-        if response.status_code != 200:
-            error_message = f"Voice generation failed. Status code: {response.status_code}, Response: {response.text}"
-            logger.error(error_message)
-            raise Exception(error_message)
+        await asyncio.to_thread(_store_cached, audio_path, cache_path)
+        
+        logger.info(f"Audio successfully saved to {cache_path}")
+        return cache_path
 
-        # Save the audio to a temporary file
+    except aiohttp.ClientError as e:
+        logger.error(f"Network error occurred: {e}")
+        raise Exception(f"Network error: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error occurred: {e}")
+        raise Exception(f"Unexpected error: {e}")
+
+async def generate_voice_stream(
+    sentences: "asyncio.Queue[Optional[str]]",
+    eleven_api_key: str,
+    voice_id: Optional[str] = "21m00Tcm4TlvDq8ikWAM"
+) -> str:
+    """
+    Generate speech for sentences as they arrive on a queue, using ElevenLabs' streaming endpoint.
+
+    Sentences are consumed until a `None` sentinel is received. Whatever has queued up
+    while the previous request was in flight is sent together, and every response is
+    appended to the same MP3 file.
+
+    Args:
+        sentences (asyncio.Queue): Queue of sentences to speak, terminated by `None`.
+        eleven_api_key (str): Your ElevenLabs API key.
+        voice_id (str, optional): The ID of the voice to use. Defaults to a valid voice_id.
+
+    Returns:
+        str: The path to the saved audio file.
+
+    Raises:
+        ValueError: If no text was received or the API key is empty.
+        Exception: If an API request fails or if there is a network error.
+    """
+    if not eleven_api_key:
+        raise ValueError("ElevenLabs API key is required.")
+
+    try:
         audio_path = f"output_{uuid.uuid4().hex}.mp3"
-        with open(audio_path, "wb") as f:
-            f.write(response.content)
-        
+        spoken = False
+        try:
+            # Stream each chunk of speech into the same file
+            with open(audio_path, "wb") as f:
+                done = False
+                while not done:
+                    batch = [await sentences.get()]
+                    while not sentences.empty():
+                        batch.append(sentences.get_nowait())
+                    if None in batch:
+                        batch = batch[:batch.index(None)]
+                        done = True
+                    text = " ".join(batch).strip()
+                    if not text:
+                        continue
+                    logger.info("Streaming voiceover chunk from ElevenLabs API...")
+                    await _synthesize_to_file(text, eleven_api_key, voice_id, f, stream=True)
+                    spoken = True
+
+            if not spoken:
+                raise ValueError("Text cannot be empty.")
+        except BaseException:
+            # Don't leave a truncated audio file behind
+            await asyncio.to_thread(_remove_partial, audio_path)
+            raise
+
         logger.info(f"Audio successfully saved to {audio_path}")
         return audio_path
 
-    except requests.exceptions.RequestException as e:
+    except aiohttp.ClientError as e:
         logger.error(f"Network error occurred: {e}")
         raise Exception(f"Network error: {e}")
     except Exception as e:
         logger.error(f"Unexpected error occurred: {e}")
-        raise Exception(f"Unexpected error: {e}")
\ No newline at end of file
+        raise Exception(f"Unexpected error: {e}")